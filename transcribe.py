@@ -1,25 +1,43 @@
-import assemblyai as aai
 import json
+import re
 import sys
 import os
-from datetime import timedelta
+import subprocess
+import tempfile
+import types
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
 
 # ─── CONFIG ───────────────────────────────────────────────────────────────────
 API_KEY_FILE = "aai_api_key.txt"  # This file should contain your AssemblyAI API key
 CONFIG_FILE = "config.json"       # Language, model, and transcription options
+MAX_WORKERS = 8                   # Audio files transcribed concurrently
+COMPRESS_THRESHOLD = 5 * 1024 * 1024  # Re-encode files larger than this before upload
+SILENCE_NOISE = "-35dB"           # Audio quieter than this counts as silence
+SILENCE_MIN_SECONDS = 2.0         # Only trim silences at least this long
+SILENCE_KEEP_SECONDS = 0.5        # Gap left in place of each trimmed silence
 # ──────────────────────────────────────────────────────────────────────────────
 
+# Speech-friendly encoding used for uploads: 16 kHz mono Opus at 32 kbps
+OPUS_ARGS = ["-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "32k"]
 
+SILENCE_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+@lru_cache(maxsize=1)
 def load_api_key(path: str = API_KEY_FILE) -> str:
     """Load the AssemblyAI API key from a local file."""
-    if not os.path.exists(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            key = f.read().strip()
+    except FileNotFoundError:
         print(f"Error: API key file not found: {path}")
         print("Create this file and put your AssemblyAI API key on a single line.")
         sys.exit(1)
 
-    with open(path, "r", encoding="utf-8") as f:
-        key = f.read().strip()
-
     if not key:
         print(f"Error: API key file {path} is empty.")
         sys.exit(1)
@@ -27,15 +45,15 @@ def load_api_key(path: str = API_KEY_FILE) -> str:
     return key
 
 
-def load_transcription_config(path: str = CONFIG_FILE) -> dict:
-    """Load language and model settings from config.json."""
-    if not os.path.exists(path):
-        print(f"Error: Config file not found: {path}")
-        sys.exit(1)
-
+@lru_cache(maxsize=1)
+def load_transcription_config(path: str = CONFIG_FILE) -> types.MappingProxyType:
+    """Load language and model settings from config.json (read-only, cached)."""
     try:
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Config file not found: {path}")
+        sys.exit(1)
     except json.JSONDecodeError as e:
         print(f"Error: {path} is not valid JSON: {e}")
         sys.exit(1)
@@ -49,23 +67,236 @@ def load_transcription_config(path: str = CONFIG_FILE) -> dict:
         print("Error: config.json 'speech_models' must be a non-empty list.")
         sys.exit(1)
 
-    return data
+    # Read-only view so the cached config can't be mutated by callers
+    return types.MappingProxyType(data)
 
 
 def format_timestamp(ms):
     """Convert milliseconds to HH:MM:SS format."""
-    seconds = ms // 1000
-    return str(timedelta(seconds=seconds))
+    hours, rem = divmod(ms // 1000, 3600)
+    minutes, seconds = divmod(rem, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
-def transcribe(audio_path):
-    if not os.path.exists(audio_path):
-        print(f"Error: File not found: {audio_path}")
-        sys.exit(1)
 
-    print(f"Uploading {audio_path}...")
+def write_transcript(audio_path: str, transcript, segments=None) -> str:
+    """
+    Save the transcript next to the audio file and return the output path.
+    `segments` (from trim_silence) maps timestamps back to the original audio.
+    """
+    # Build output file path next to the input file
+    base = os.path.splitext(audio_path)[0]
+    output_path = base + "_transcript.txt"
+
+    # Build the whole transcript in memory and write it out in one go
+    parts = [
+        f"TRANSCRIPT: {os.path.basename(audio_path)}\n",
+        "=" * 60 + "\n\n",
+    ]
+
+    append = parts.append
+    speaker_labels = {}
+    current_speaker = None
+    for utterance in transcript.utterances:
+        speaker = utterance.speaker
+
+        # Add a blank line between speaker changes for readability
+        if speaker != current_speaker:
+            if current_speaker is not None:
+                append("\n")
+            label = speaker_labels.get(speaker)
+            if label is None:
+                label = speaker_labels[speaker] = f"Speaker {speaker}"
+            timestamp = format_timestamp(to_original_ms(utterance.start, segments))
+            append(f"[{timestamp}] {label}:\n")
+            current_speaker = speaker
+
+        append(utterance.text)
+        append("\n")
+
+    # Encode once and write raw bytes, bypassing the text layer
+    Path(output_path).write_bytes("".join(parts).encode("utf-8"))
+    return output_path
+
+
+def _encode_opus(audio_path: str, extra_args=()) -> str:
+    """
+    Encode audio with ffmpeg to a temporary OPUS_ARGS .opus file, applying
+    `extra_args` (e.g. filters) first. Returns its path; the caller must remove it.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".opus")
+    os.close(fd)
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-nostats", "-i", audio_path,
+        *extra_args, *OPUS_ARGS, tmp_path,
+    ]
+    try:
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        )
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def preprocess_audio(audio_path: str) -> str:
+    """
+    Re-encode audio with ffmpeg as small speech-quality Opus to cut upload size.
+    Returns the path of a temporary .opus file that the caller must remove.
+    """
+    return _encode_opus(audio_path)
+
+
+def detect_silences(audio_path: str) -> list:
+    """Return (start, end) seconds of long silences, found with ffmpeg silencedetect."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats", "-i", audio_path,
+        "-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN_SECONDS}",
+        "-f", "null", "-",
+    ]
+    result = subprocess.run(
+        cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, errors="replace",
+    )
+
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    if start is not None:
+        # Silence running to the end of the file
+        silences.append((start, None))
+    return silences
+
+
+def trim_silence(audio_path: str):
+    """
+    Cut long silences out of the audio, leaving a short gap in their place.
+
+    Returns (upload_path, segments). upload_path is a temporary .opus file the
+    caller must remove, and segments is a (trimmed_starts_ms, original_starts_ms)
+    table for to_original_ms(). When there is nothing to trim, returns
+    (audio_path, None).
+    """
+    silences = detect_silences(audio_path)
+    if not silences:
+        return audio_path, None
+
+    # Spans of audio to keep, in original seconds (end None = until end of file)
+    half_gap = SILENCE_KEEP_SECONDS / 2
+    spans = []
+    keep_from = 0.0
+    for start, end in silences:
+        spans.append((keep_from, start + half_gap))
+        if end is None:
+            keep_from = None
+            break
+        keep_from = end - half_gap
+    if keep_from is not None:
+        spans.append((keep_from, None))
+
+    trimmed_starts, original_starts = [], []
+    terms = []
+    position = 0.0
+    for start, end in spans:
+        trimmed_starts.append(round(position * 1000))
+        original_starts.append(round(start * 1000))
+        if end is None:
+            terms.append(f"gte(t,{start:.3f})")
+        else:
+            terms.append(f"between(t,{start:.3f},{end:.3f})")
+            position += end - start
+
+    audio_filter = f"aselect='{'+'.join(terms)}',asetpts=N/SR/TB"
+    tmp_path = _encode_opus(audio_path, ["-af", audio_filter])
+    return tmp_path, (trimmed_starts, original_starts)
+
+
+def to_original_ms(ms: int, segments) -> int:
+    """Map a time in the silence-trimmed audio back onto the original recording."""
+    if segments is None:
+        return ms
+    trimmed_starts, original_starts = segments
+    i = max(0, bisect_right(trimmed_starts, ms) - 1)
+    return original_starts[i] + (ms - trimmed_starts[i])
+
+
+def _ffmpeg_error(exc: Exception) -> str:
+    """Describe an ffmpeg failure, preferring the last line ffmpeg printed."""
+    stderr = getattr(exc, "stderr", None)
+    lines = stderr.strip().splitlines() if stderr else []
+    return lines[-1] if lines else str(exc)
+
+
+def _transcribe_one(transcriber, audio_path: str, size: int, trim: bool = False):
+    """
+    Upload and transcribe a single file (runs in a worker thread).
+    Returns (transcript, segments) where segments maps trimmed times back.
+    """
+    upload_path = audio_path
+    segments = None
+    if trim:
+        try:
+            upload_path, segments = trim_silence(audio_path)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            print(
+                f"Warning: could not trim silence from {audio_path} "
+                f"({_ffmpeg_error(exc)})."
+            )
+
+    # Trimmed audio is already re-encoded; otherwise compress large files
+    if upload_path == audio_path and size > COMPRESS_THRESHOLD:
+        try:
+            upload_path = preprocess_audio(audio_path)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            # ffmpeg missing or unable to decode: fall back to the original file
+            print(
+                f"Warning: could not compress {audio_path} "
+                f"({_ffmpeg_error(exc)}); uploading as is."
+            )
+
+    try:
+        print(f"Uploading {audio_path}...")
+        # submit() returns as soon as the audio is uploaded and the job queued
+        transcript = transcriber.submit(upload_path)
+    finally:
+        if upload_path != audio_path:
+            os.remove(upload_path)
+
+    # The temporary upload is already cleaned up; now poll the queued job
+    return transcript.wait_for_completion(), segments
+
+
+def transcribe_many(
+    audio_paths, max_workers: int = MAX_WORKERS, config_path: str = CONFIG_FILE
+):
+    """Transcribe several audio files concurrently, one transcript per file."""
+    # One stat per file both checks that it exists and gives its size
+    sizes = {}
+    for audio_path in audio_paths:
+        try:
+            sizes[audio_path] = os.path.getsize(audio_path)
+        except FileNotFoundError:
+            print(f"Error: File not found: {audio_path}")
+            sys.exit(1)
+
+    # Imported here so usage errors don't pay for loading the SDK
+    import assemblyai as aai
 
     aai.settings.api_key = load_api_key()
-    opts = load_transcription_config()
+    opts = load_transcription_config(config_path)
 
     config = aai.TranscriptionConfig(
         language_code=opts["language_code"],
@@ -74,42 +305,52 @@ def transcribe(audio_path):
     )
 
     transcriber = aai.Transcriber(config=config)
-    transcript = transcriber.transcribe(audio_path)
+    trim = opts.get("trim_silence", False)
+    failed = 0
 
-    if transcript.status == aai.TranscriptStatus.error:
-        print(f"Transcription failed: {transcript.error}")
-        sys.exit(1)
-
-    print("Transcription complete. Saving output...")
+    # Transcription is network-bound, so overlap uploads and server-side work
+    workers = max(1, min(max_workers, len(audio_paths)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_transcribe_one, transcriber, path, sizes[path], trim): path
+            for path in audio_paths
+        }
+        for future in as_completed(futures):
+            audio_path = futures[future]
+            try:
+                transcript, segments = future.result()
+            except Exception as exc:
+                print(f"Transcription failed for {audio_path}: {exc}")
+                failed += 1
+                continue
 
-    # Build output file path next to the input file
-    base = os.path.splitext(audio_path)[0]
-    output_path = base + "_transcript.txt"
+            if transcript.status == aai.TranscriptStatus.error:
+                print(f"Transcription failed for {audio_path}: {transcript.error}")
+                failed += 1
+                continue
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(f"TRANSCRIPT: {os.path.basename(audio_path)}\n")
-        f.write("=" * 60 + "\n\n")
+            print(f"Transcription complete for {audio_path}. Saving output...")
+            try:
+                output_path = write_transcript(audio_path, transcript, segments)
+            except OSError as exc:
+                print(f"Could not save transcript for {audio_path}: {exc}")
+                failed += 1
+                continue
+            print(f"\nDone! Transcript saved to: {output_path}")
 
-        current_speaker = None
-        for utterance in transcript.utterances:
-            speaker = f"Speaker {utterance.speaker}"
-            timestamp = format_timestamp(utterance.start)
+    if failed:
+        sys.exit(1)
 
-            # Add a blank line between speaker changes for readability
-            if speaker != current_speaker:
-                if current_speaker is not None:
-                    f.write("\n")
-                f.write(f"[{timestamp}] {speaker}:\n")
-                current_speaker = speaker
 
-            f.write(f"{utterance.text}\n")
+def transcribe(audio_path, config_path: str = CONFIG_FILE):
+    """Transcribe a single audio file."""
+    transcribe_many([audio_path], config_path=config_path)
 
-    print(f"\nDone! Transcript saved to: {output_path}")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python transcribe.py path\\to\\your_file.m4a")
-        print("Example: python transcribe.py C:\\Meetings\\call1.m4a")
+        print("Usage: python transcribe.py path\\to\\your_file.m4a [more_files ...]")
+        print("Example: python transcribe.py C:\\Meetings\\call1.m4a C:\\Meetings\\call2.m4a")
         sys.exit(1)
 
-    transcribe(sys.argv[1])
\ No newline at end of file
+    transcribe_many(sys.argv[1:])
@@ -1,66 +1,89 @@
+import io
 import os
 import re
 import sys
+import tempfile
+import zipfile
 from datetime import datetime
-
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
-
+from itertools import chain, dropwhile
+from xml.sax.saxutils import escape
+
+# python-docx is imported inside the functions that use it, so
+# usage errors and missing files are reported without loading them.
+
+# Space after the last paragraph of each turn, in twips (12 pt, about one blank line)
+TURN_SPACING_TWIPS = 240
+
+# Deflate level for the .docx zip (speed/size balance)
+DOCX_COMPRESSLEVEL = 6
+
+# Color palette (RGB) to differentiate speakers.
+# Will be reused/cycled automatically if there are many speakers.
+SPEAKER_COLORS = [
+    (31, 73, 125),   # dark blue
+    (79, 129, 189),  # blue
+    (112, 48, 160),  # purple
+    (0, 128, 0),     # green
+    (192, 80, 77),   # red
+    (128, 96, 0),    # brown/gold
+]
+
+# Code points that may not appear in XML 1.0 text (e.g. most C0 control chars)
+INVALID_XML_CHARS_RE = re.compile(
+    "[^\u0009\u000a\u000d\u0020-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]"
+)
 
 TIMESTAMP_LINE_RE = re.compile(
-    r"^\[(\d{1,2}:\d{2}:\d{2})\]\s+(Speaker\s+\w+):\s*$"
+    r"^\[(\d{1,2}:\d{2}:\d{2})\]\s+(Speaker\s+(\w+)):\s*$", re.ASCII
 )
 
 
 def parse_transcript(txt_path: str):
     """
-    Parse the .txt transcript produced by transcribe.py into
-    a list of (timestamp, speaker, text) utterances.
+    Parse the .txt transcript produced by transcribe.py, yielding
+    (timestamp, speaker, speaker_id, text) utterances as the file is read,
+    where speaker_id is the raw id from the label (e.g. "A" in "Speaker A").
     """
-    with open(txt_path, "r", encoding="utf-8") as f:
-        lines = [line.rstrip("\n") for line in f]
-
-    entries = []
-    i = 0
-
-    # Skip header lines until we hit the first timestamp line
-    while i < len(lines) and not TIMESTAMP_LINE_RE.match(lines[i]):
-        i += 1
+    match_ts = TIMESTAMP_LINE_RE.match
 
-    while i < len(lines):
-        match = TIMESTAMP_LINE_RE.match(lines[i])
-        if not match:
-            i += 1
-            continue
-
-        timestamp = match.group(1)
-        speaker = match.group(2)
-        i += 1
+    with open(txt_path, "r", encoding="utf-8", buffering=1 << 20) as f:
+        # Skip header lines until we hit the first timestamp line. Only
+        # timestamp lines start with "[", and the main loop still checks them
+        # against the regex, so a prefix test is enough here.
+        lines = dropwhile(lambda line: not line.startswith("["), f)
 
+        timestamp = speaker = speaker_id = None
         utter_lines = []
-        # Collect non-empty lines until next timestamp or blank separator
-        while (
-            i < len(lines)
-            and lines[i].strip() != ""
-            and not TIMESTAMP_LINE_RE.match(lines[i])
-        ):
-            utter_lines.append(lines[i].strip())
-            i += 1
-
-        text = " ".join(utter_lines).strip()
-        entries.append((timestamp, speaker, text))
-
-        # Skip any blank separator lines
-        while i < len(lines) and lines[i].strip() == "":
-            i += 1
-
-    return entries
-
-
-def configure_document_styles(document: Document):
+        collecting = False
+
+        for line in lines:
+            line = line.rstrip("\n")
+            # Cheap prefix screen: only timestamp lines start with "["
+            match = line.startswith("[") and match_ts(line)
+            if match:
+                if timestamp is not None:
+                    yield timestamp, speaker, speaker_id, " ".join(utter_lines).strip()
+                timestamp, speaker, speaker_id = match.groups()
+                utter_lines = []
+                collecting = True
+            elif line.strip() == "":
+                # A blank separator ends the current utterance
+                collecting = False
+            elif collecting:
+                utter_lines.append(line.strip())
+
+        if timestamp is not None:
+            yield timestamp, speaker, speaker_id, " ".join(utter_lines).strip()
+
+
+def configure_document_styles(document):
     """
     Configure basic page layout and fonts for a clean, readable therapy transcript.
+    Returns a (heading_style_id, text_style_id) pair per SPEAKER_COLORS entry.
     """
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.shared import Pt, Inches, RGBColor
+
     # Page layout: standard 1-inch margins
     for section in document.sections:
         section.left_margin = Inches(1)
@@ -74,15 +97,97 @@ def configure_document_styles(document: Document):
     normal_font.name = "Calibri"
     normal_font.size = Pt(11)
 
+    # One heading + text character style per speaker color, so utterance runs
+    # reference a style instead of carrying their own formatting
+    speaker_styles = []
+    for n, rgb in enumerate(SPEAKER_COLORS, start=1):
+        heading_style = document.styles.add_style(
+            f"Speaker {n} Heading", WD_STYLE_TYPE.CHARACTER
+        )
+        heading_style.font.bold = True
+        heading_style.font.color.rgb = RGBColor(*rgb)
+
+        text_style = document.styles.add_style(
+            f"Speaker {n} Text", WD_STYLE_TYPE.CHARACTER
+        )
+        text_style.font.color.rgb = RGBColor(*rgb)
+
+        speaker_styles.append((heading_style.style_id, text_style.style_id))
+
+    return speaker_styles
+
+
+def _run_xml(text: str, style_id: str) -> str:
+    """Return a <w:r> holding a single run of text in a character style."""
+    if INVALID_XML_CHARS_RE.search(text):
+        raise ValueError(
+            "All strings must be XML compatible: Unicode or ASCII, "
+            "no NULL bytes or control characters"
+        )
+    return (
+        f'<w:r><w:rPr><w:rStyle w:val="{style_id}"/></w:rPr>'
+        f"<w:t>{escape(text)}</w:t></w:r>"
+    )
+
+
+def _utterance_xml(timestamp: str, speaker: str, text: str, styles) -> str:
+    """
+    Return the <w:p> elements for one utterance (heading + text), using the
+    speaker's (heading_style_id, text_style_id) pair.
+    """
+    heading_style, text_style = styles
+    # Space between turns, instead of an extra empty paragraph
+    spacing = f'<w:pPr><w:spacing w:after="{TURN_SPACING_TWIPS}"/></w:pPr>'
+    heading = _run_xml(f"[{timestamp}] {speaker}", heading_style)
+    if not text:
+        return f"<w:p>{spacing}{heading}</w:p>"
+    return f"<w:p>{heading}</w:p><w:p>{spacing}{_run_xml(text, text_style)}</w:p>"
+
+
+def _write_docx(template, docx_path: str, body_parts):
+    """
+    Copy a saved python-docx document into docx_path, streaming the
+    `body_parts` XML strings into word/document.xml ahead of the final sectPr.
+    """
+    with zipfile.ZipFile(template) as src, zipfile.ZipFile(
+        docx_path, "w", zipfile.ZIP_DEFLATED, compresslevel=DOCX_COMPRESSLEVEL
+    ) as dst:
+        for item in src.infolist():
+            data = src.read(item)
+            if item.filename != "word/document.xml":
+                dst.writestr(item.filename, data)
+                continue
+
+            xml = data.decode("utf-8")
+            # Body content must stay in front of the trailing section properties
+            split_at = xml.rfind("<w:sectPr")
+            if split_at == -1:
+                split_at = xml.rindex("</w:body>")
+
+            # Keep the template's timestamp (ZipFile.open() would stamp 1980)
+            # and compression settings for the streamed entry
+            info = zipfile.ZipInfo(item.filename, date_time=item.date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info._compresslevel = DOCX_COMPRESSLEVEL
+            raw = dst.open(info, "w")
+            with io.TextIOWrapper(raw, encoding="utf-8") as out:
+                out.write(xml[:split_at])
+                for part in body_parts:
+                    out.write(part)
+                out.write(xml[split_at:])
+
 
 def create_docx_from_transcript(txt_path: str, docx_path: str):
+    from docx import Document
+
     entries = parse_transcript(txt_path)
+    first = next(entries, None)
 
-    if not entries:
+    if first is None:
         raise ValueError("No transcript entries were parsed from the .txt file.")
 
     document = Document()
-    configure_document_styles(document)
+    speaker_styles = configure_document_styles(document)
 
     base_name = os.path.basename(txt_path)
     session_title = "Therapy Session Transcript"
@@ -122,43 +227,42 @@ def create_docx_from_transcript(txt_path: str, docx_path: str):
 
     document.add_paragraph()  # Blank line for spacing
 
-    # Color palette to differentiate speakers.
-    # Will be reused/cycled automatically if there are many speakers.
-    color_palette = [
-        RGBColor(31, 73, 125),   # dark blue
-        RGBColor(79, 129, 189),  # blue
-        RGBColor(112, 48, 160),  # purple
-        RGBColor(0, 128, 0),     # green
-        RGBColor(192, 80, 77),   # red
-        RGBColor(128, 96, 0),    # brown/gold
-    ]
-    speaker_colors = {}
+    offset = ord("A")
 
     # Add each utterance as a timestamp + speaker heading, followed by the text
-    for timestamp, speaker, text in entries:
-        # Assign a color for this speaker if not already assigned
-        if speaker not in speaker_colors:
-            color = color_palette[len(speaker_colors) % len(color_palette)]
-            speaker_colors[speaker] = color
-        else:
-            color = speaker_colors[speaker]
-
-        # Heading line with timestamp and speaker
-        heading_para = document.add_paragraph()
-        heading_run = heading_para.add_run(f"[{timestamp}] {speaker}")
-        heading_run.bold = True
-        heading_run.font.color.rgb = color
-
-        # Utterance text (same color as the speaker heading)
-        if text:
-            text_para = document.add_paragraph()
-            text_run = text_para.add_run(text)
-            text_para.style = document.styles["Normal"]
-            text_run.font.color.rgb = color
-
-        document.add_paragraph()  # Blank line between turns
-
-    document.save(docx_path)
+    body_parts = (
+        # Speaker A gets the first color, B the second, and so on
+        _utterance_xml(
+            timestamp,
+            speaker,
+            text,
+            speaker_styles[(ord(speaker_id[0]) - offset) % len(speaker_styles)],
+        )
+        for timestamp, speaker, speaker_id, text in chain([first], entries)
+    )
+
+    # Only the static header goes through python-docx; the utterances are
+    # streamed straight into the zip instead of growing the in-memory tree
+    template = io.BytesIO()
+    document.save(template)
+
+    # Write to a temporary file next to the target and only replace docx_path
+    # once the whole transcript has been written, so a failure midway never
+    # truncates or deletes an existing document
+    fd, tmp_path = tempfile.mkstemp(
+        suffix=".docx", dir=os.path.dirname(docx_path) or "."
+    )
+    os.close(fd)
+    try:
+        _write_docx(template, tmp_path, body_parts)
+        # mkstemp creates the file as 0600; give it the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, docx_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
 
 
 def main():